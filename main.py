@@ -3,44 +3,62 @@ Main entry point for the Telegram Censor Bot
 """
 import logging
 import asyncio
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
-from src.config import Config
-from src.handlers.message_handlers import (
-    start_command,
-    help_command, 
-    status_command,
-    handle_document,
-    handle_photo,
-    handle_unknown,
-    error_handler
-)
+from src.config import config
 
 # Configure logging
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    level=logging.INFO if not Config.DEBUG else logging.DEBUG
+    level=logging.INFO if not config.debug else logging.DEBUG
 )
 logger = logging.getLogger(__name__)
 
+async def post_shutdown(app) -> None:
+    """Release resources shared across updates"""
+    from src.processors.pdf_processor import shutdown_executor
+    from src.services.file_service import file_service
+    
+    await file_service.close()
+    await asyncio.to_thread(shutdown_executor)
+
 def main() -> None:
     """Start the bot"""
+    # The bot is only imported here: PDF extraction workers are spawned
+    # processes that re-import this module, and must not load the bot (and
+    # with it torch and EasyOCR) just to extract text
+    from telegram.ext import Application, CommandHandler, MessageHandler, filters
+    from src.handlers.message_handlers import (
+        start_command,
+        help_command, 
+        status_command,
+        handle_document,
+        handle_photo,
+        handle_unknown,
+        error_handler
+    )
+    
     try:
         # Validate configuration
-        Config.validate()
+        config.validate()
         
         logger.info("Starting Telegram Censor Bot...")
         
-        # Create application
-        app = Application.builder().token(Config.TELEGRAM_BOT_TOKEN).build()
+        # Create application, processing updates from different chats concurrently
+        app = (
+            Application.builder()
+            .token(config.telegram_bot_token)
+            .concurrent_updates(config.concurrent_updates)
+            .post_shutdown(post_shutdown)
+            .build()
+        )
         
         # Add command handlers
         app.add_handler(CommandHandler("start", start_command))
         app.add_handler(CommandHandler("help", help_command))
         app.add_handler(CommandHandler("status", status_command))
         
-        # Add message handlers
-        app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
-        app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
+        # Add message handlers, file processing is slow so don't block other updates
+        app.add_handler(MessageHandler(filters.Document.ALL, handle_document, block=False))
+        app.add_handler(MessageHandler(filters.PHOTO, handle_photo, block=False))
         
         # Handle unknown message types
         app.add_handler(MessageHandler(
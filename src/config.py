@@ -2,32 +2,55 @@
 Configuration management for the Telegram Censor Bot
 """
 import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, Optional
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
+@dataclass(frozen=True, slots=True)
 class Config:
     # Telegram Bot
-    TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+    telegram_bot_token: Optional[str]
     
     # Ollama Configuration
-    OLLAMA_BASE_URL = os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
-    OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'llama3.2')
+    ollama_base_url: str
+    ollama_model: str
+    ollama_max_concurrency: int
     
     # Bot Settings
-    MAX_FILE_SIZE_MB = int(os.getenv('MAX_FILE_SIZE_MB', '20'))
-    SUPPORTED_FORMATS = os.getenv('SUPPORTED_FORMATS', 'pdf,docx,xlsx,txt,jpg,jpeg,png,gif').split(',')
-    DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
+    max_file_size_mb: int
+    supported_formats: FrozenSet[str]
+    concurrent_updates: int
+    debug: bool
     
     # Censoring Settings
-    CONFIDENCE_THRESHOLD = float(os.getenv('CONFIDENCE_THRESHOLD', '0.8'))
-    REDACTION_COLOR = os.getenv('REDACTION_COLOR', 'black')
+    confidence_threshold: float
+    redaction_color: str
     
-    @classmethod
-    def validate(cls):
+    def validate(self):
         """Validate required configuration"""
-        if not cls.TELEGRAM_BOT_TOKEN:
+        if not self.telegram_bot_token:
             raise ValueError("TELEGRAM_BOT_TOKEN is required. Please set it in your .env file.")
         
         return True
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    """Load configuration from the environment (and .env file) once"""
+    load_dotenv()
+    
+    return Config(
+        telegram_bot_token=os.getenv('TELEGRAM_BOT_TOKEN'),
+        ollama_base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
+        ollama_model=os.getenv('OLLAMA_MODEL', 'llama3.2'),
+        ollama_max_concurrency=int(os.getenv('OLLAMA_MAX_CONCURRENCY', '2')),
+        max_file_size_mb=int(os.getenv('MAX_FILE_SIZE_MB', '20')),
+        supported_formats=frozenset(os.getenv('SUPPORTED_FORMATS', 'pdf,docx,xlsx,txt,jpg,jpeg,png,gif').split(',')),
+        concurrent_updates=int(os.getenv('CONCURRENT_UPDATES', '32')),
+        debug=os.getenv('DEBUG', 'False').lower() == 'true',
+        confidence_threshold=float(os.getenv('CONFIDENCE_THRESHOLD', '0.8')),
+        redaction_color=os.getenv('REDACTION_COLOR', 'black'),
+    )
+
+# Global instance
+config = get_config()
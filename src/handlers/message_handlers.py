@@ -1,8 +1,11 @@
 """
 Basic message handlers for the Telegram bot
 """
+import asyncio
 import logging
+import os
 from telegram import Update, InputFile
+from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from src.services.file_service import file_service
 from src.processors.processor_factory import processor_factory
@@ -10,9 +13,7 @@ from src.services.ollama_service import ollama_service
 
 logger = logging.getLogger(__name__)
 
-async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle the /start command"""
-    welcome_message = """
+_WELCOME = """
 🤖 **Welcome to Censor Bot!**
 
 This bot helps you censor sensitive information in documents and images using AI.
@@ -32,16 +33,9 @@ This bot helps you censor sensitive information in documents and images using AI
 /status - Check bot and AI model status
 
 Send me a file to get started! 🚀
-    """
-    
-    await update.message.reply_text(
-        welcome_message,
-        parse_mode='Markdown'
-    )
+"""
 
-async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle the /help command"""
-    help_message = """
+_HELP = """
 🆘 **Help & Support**
 
 **What does this bot do?**
@@ -63,18 +57,9 @@ I scan your documents and images for sensitive information like:
 - **Images:** JPEG, PNG, GIF (with OCR text extraction)
 
 **File size limit:** 20MB per file
-    """
-    
-    await update.message.reply_text(
-        help_message,
-        parse_mode='Markdown'
-    )
+"""
 
-async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handle the /status command - check bot and AI model status"""
-    try:
-        # This will be implemented when we add Ollama integration
-        status_message = """
+_STATUS = """
 📊 **Bot Status**
 
 🤖 **Bot:** ✅ Online
@@ -83,11 +68,33 @@ async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 🔧 **Services:** ✅ All systems operational
 
 Ready to process your files! 🚀
-        """
-        
+"""
+
+_DOCUMENT_PROCESSING = "🔄 Processing your document...\nThis may take a few moments."
+
+_DOCUMENT_SENT = "✅ Here is your redacted file!\nFile has been deleted on our servers..."
+
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the /start command"""
+    await update.message.reply_text(
+        _WELCOME,
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the /help command"""
+    await update.message.reply_text(
+        _HELP,
+        parse_mode=ParseMode.MARKDOWN
+    )
+
+async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the /status command - check bot and AI model status"""
+    try:
+        # This will be implemented when we add Ollama integration
         await update.message.reply_text(
-            status_message,
-            parse_mode='Markdown'
+            _STATUS,
+            parse_mode=ParseMode.MARKDOWN
         )
     except Exception as e:
         logger.error(f"Error in status command: {e}")
@@ -111,20 +118,20 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
     
     # Check file format
-    file_extension = document.file_name.split('.')[-1].lower() if document.file_name else ''
-    supported_formats = ['pdf', 'docx', 'xlsx', 'txt']
+    file_extension = os.path.splitext(document.file_name or '')[1][1:].lower()
     
-    if file_extension not in supported_formats:
+    if not processor_factory.is_supported(file_extension):
         await update.message.reply_text(
             f"❌ Unsupported file format: {file_extension}\n"
-            f"Supported formats: {', '.join(supported_formats)}"
+            f"Supported formats: {', '.join(processor_factory.get_supported_extensions())}"
         )
         return
     
     # Send processing message
-    processing_msg = await update.message.reply_text(
-        "🔄 Processing your document...\nThis may take a few moments."
-    )
+    processing_msg = await update.message.reply_text(_DOCUMENT_PROCESSING)
+    
+    file_path = None
+    res = None
     
     try:
         file_path , filename = await file_service.download_document(document)
@@ -133,41 +140,52 @@ async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         
         res = await processor.process_file(file_path, ollama_service)        
         
-        with open(res.output_file, "r") as f:
-            await update.message.reply_document(f,filename=f"redacted_{filename}.{file_extension}")
+        if not res.success:
+            await processing_msg.edit_text(f"❌ {res.message}")
+            return
         
-        await processing_msg.edit_text(
-            "✅ File has been sent to you! \n"+
-            "File has been deleted on our servers..."
-        )
+        if not res.output_file:
+            # Nothing was redacted, so there is no file to send back
+            await processing_msg.edit_text(f"✅ {res.message}")
+            return
         
-        file_service.cleanup_file(file_path);
-        file_service.cleanup_file(res.output_file);
+        # Don't upload an empty or missing output file
+        if not os.path.isfile(res.output_file) or os.path.getsize(res.output_file) == 0:
+            raise Exception(f"Redacted output file is missing or empty: {res.output_file}")
+        
+        # Let python-telegram-bot stream the file from disk, the document
+        # itself signals success so the processing message isn't edited
+        await update.message.reply_document(
+            document=res.output_file,
+            filename=f"redacted_{filename}.{file_extension}",
+            caption=_DOCUMENT_SENT
+        )
     except Exception as e:
         logger.error(f"Error processing document: {e}")
         await processing_msg.edit_text(
             "❌ Error processing document. Please try again later."
         )
+    finally:
+        # Clean up in the background so the user isn't kept waiting
+        for path in (file_path, res and res.output_file):
+            if path:
+                context.application.create_task(asyncio.to_thread(file_service.cleanup_file, path))
 
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle photo/image uploads"""
     photo = update.message.photo[-1]  # Get highest resolution version
     
-    # Send processing message
-    processing_msg = await update.message.reply_text(
-        "🔄 Processing your image...\nExtracting text and analyzing for sensitive information."
-    )
-    
     try:
         # TODO: Implement image processing with OCR and Ollama
-        await processing_msg.edit_text(
+        # Reply straight away rather than sending and then editing a processing message
+        await update.message.reply_text(
             "⚠️ Image processing is not yet implemented.\n"
             "Coming soon in the next update!"
         )
         
     except Exception as e:
         logger.error(f"Error processing image: {e}")
-        await processing_msg.edit_text(
+        await update.message.reply_text(
             "❌ Error processing image. Please try again later."
         )
 
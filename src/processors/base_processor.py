@@ -2,13 +2,19 @@
 Base processor class for all file types
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from dataclasses import dataclass, field
+from typing import Optional, List, Tuple
 import tempfile
 import os
 import logging
+from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Temporary file storage, created once at import
+TEMP_DIR = Path.cwd() / 'temp'
+TEMP_DIR.mkdir(exist_ok=True)
+
 class BaseProcessor(ABC):
     """Abstract base class for all file processors"""
     
@@ -30,7 +36,7 @@ class BaseProcessor(ABC):
         pass
     
     @abstractmethod
-    async def apply_redactions(self, file_path: str, redactions: List[Dict[str, Any]], output_path: str) -> bool:
+    async def apply_redactions(self, file_path: str, redactions: List["Suggestion"], output_path: str) -> bool:
         """
         Apply redactions to the file and save to output path
         
@@ -53,18 +59,11 @@ class BaseProcessor(ABC):
         max_bytes = self.max_file_size_mb * 1024 * 1024
         return file_size <= max_bytes
     
-    async def create_temp_file(self, original_filename: str) -> str:
+    def create_temp_file(self, original_filename: str) -> str:
         """Create a temporary file for processing"""
-        temp_dir = os.path.join(os.getcwd(), 'temp')
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        temp_file = tempfile.NamedTemporaryFile(
-            dir=temp_dir,
-            suffix=f"_{original_filename}",
-            delete=False
-        )
-        temp_file.close()
-        return temp_file.name
+        fd, path = tempfile.mkstemp(dir=TEMP_DIR, suffix=f"_{original_filename}")
+        os.close(fd)
+        return path
     
     def cleanup_temp_file(self, file_path: str) -> None:
         """Clean up temporary file"""
@@ -75,15 +74,22 @@ class BaseProcessor(ABC):
         except Exception as e:
             logger.warning(f"Failed to cleanup temp file {file_path}: {e}")
 
+@dataclass(slots=True)
+class Suggestion:
+    """A piece of sensitive text and what to replace it with"""
+    text: str
+    replacement: str
+    type: str
+    confidence: float
+    # (start, end) positions the text was reported at
+    spans: List[Tuple[int, int]] = field(default_factory=list)
+
+@dataclass(slots=True)
 class ProcessingResult:
     """Result of file processing operation"""
-    
-    def __init__(self, success: bool, message: str = "", 
-                 extracted_text: str = "", output_file: Optional[str] = None,
-                 pii_found: bool = False, redaction_count: int = 0):
-        self.success = success
-        self.message = message
-        self.extracted_text = extracted_text
-        self.output_file = output_file
-        self.pii_found = pii_found
-        self.redaction_count = redaction_count
\ No newline at end of file
+    success: bool
+    message: str = ""
+    extracted_text: str = ""
+    output_file: Optional[str] = None
+    pii_found: bool = False
+    redaction_count: int = 0
\ No newline at end of file
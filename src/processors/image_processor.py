@@ -1,39 +1,161 @@
 """
 Image processor with OCR capabilities
 """
+import asyncio
+import io
 import logging
 import os
-from typing import Dict, Any, List
-from .base_processor import BaseProcessor, ProcessingResult
+from typing import Dict, Any, List, Optional, Tuple
+from .base_processor import BaseProcessor, ProcessingResult, Suggestion
+
+try:
+    import ahocorasick
+    import easyocr
+    import numpy as np
+    import torch
+    from PIL import Image
+    _AVAILABLE = True
+except ImportError as e:
+    _AVAILABLE = False
+    _IMPORT_ERROR = e
 
 logger = logging.getLogger(__name__)
 
+# Shared OCR reader - loading the EasyOCR models is expensive, so do it once
+_READER: Optional["easyocr.Reader"] = None
+_READER_LOCK = asyncio.Lock()
+
+# Opaque black for each image mode that can be painted directly
+_FILL = {
+    'L': 0,
+    'LA': (0, 255),
+    'RGB': (0, 0, 0),
+    'RGBA': (0, 0, 0, 255),
+}
+
+# Longest image side fed to OCR, larger images are downscaled first
+_OCR_MAX_SIDE = 2000
+
+# Number of recent OCR results kept per processor
+_OCR_CACHE_SIZE = 8
+
+async def _get_reader() -> "easyocr.Reader":
+    """Get the shared EasyOCR reader, creating it on first use"""
+    global _READER
+    
+    if not _AVAILABLE:
+        raise ImportError(f"Image processing libraries not available: {_IMPORT_ERROR}")
+    
+    if _READER is None:
+        async with _READER_LOCK:
+            if _READER is None:
+                # Initialize OCR reader (English by default). Loading (and on first
+                # run downloading) the models takes seconds, so keep it off the event loop
+                _READER = await asyncio.to_thread(easyocr.Reader, ['en'], gpu=torch.cuda.is_available())
+                logger.info("Loaded EasyOCR reader")
+    
+    return _READER
+
+def _read_text(reader: "easyocr.Reader", file_path: str) -> List[tuple]:
+    """
+    Run OCR on an image, downscaling large images first
+    
+    OCR accuracy stops improving well below typical phone photo sizes, while
+    detection cost grows with the pixel count. Boxes are mapped back onto the
+    original image so redactions can be drawn on it unchanged.
+    """
+    with Image.open(file_path) as image:
+        scale = min(1.0, _OCR_MAX_SIDE / max(image.size))
+        if scale >= 1.0:
+            return reader.readtext(file_path)
+        
+        size = (round(image.width * scale), round(image.height * scale))
+        buffer = io.BytesIO()
+        image.convert('RGB').resize(size, Image.LANCZOS).save(buffer, format='PNG')
+    
+    results = reader.readtext(buffer.getvalue())
+    return [
+        ([[x / scale, y / scale] for x, y in bbox], text, confidence)
+        for bbox, text, confidence in results
+    ]
+
+def _fill_rects(arr: "np.ndarray", rects: List[Tuple[int, int, int, int]], fill) -> None:
+    """
+    Fill (x0, y0, x1, y1) rectangles of an image array in place
+    
+    Each rectangle is one slice assignment, which only touches the pixels
+    inside it, so the cost follows the redacted area rather than the image size.
+    """
+    for (x0, y0, x1, y1) in rects:
+        arr[y0:y1, x0:x1] = fill
+
+def _paint_rects(file_path: str, rects: List[Tuple[int, int, int, int]], output_path: str) -> None:
+    """Paint rectangles of an image black and save the result"""
+    # Open image, palette and other exotic modes are painted as RGB
+    with Image.open(file_path) as image:
+        image_format = image.format
+        mode = image.mode if image.mode in _FILL else 'RGB'
+        
+        # Paint the boxes black directly in the pixel buffer
+        arr = np.array(image if image.mode == mode else image.convert('RGB'))
+    
+    _fill_rects(arr, rects, _FILL[mode])
+    
+    # Save redacted image, skipping the slow JPEG optimize pass
+    redacted = Image.fromarray(arr, mode=mode)
+    if image_format == 'JPEG':
+        redacted.save(output_path, quality=85, optimize=False)
+    else:
+        redacted.save(output_path)
+
 class ImageProcessor(BaseProcessor):
     """Processor for image files with OCR text extraction"""
     
     def __init__(self):
         super().__init__()
         self.supported_extensions = ['jpg', 'jpeg', 'png', 'gif', 'bmp']
+        self._ocr_cache: Dict[Tuple[str, float], List[tuple]] = {}
+        
+        if not _AVAILABLE:
+            logger.warning(f"Image processing is unavailable: {_IMPORT_ERROR}")
+    
+    async def _ocr(self, file_path: str) -> List[tuple]:
+        """
+        Run OCR on an image, reusing the result for an unchanged file
+        
+        Args:
+            file_path: Path to the image
+            
+        Returns:
+            List of (bbox, text, confidence) tuples from EasyOCR
+        """
+        key = (file_path, os.path.getmtime(file_path))
+        if key in self._ocr_cache:
+            return self._ocr_cache[key]
+        
+        reader = await _get_reader()
+        
+        # OCR is CPU/GPU bound, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(None, _read_text, reader, file_path)
+        
+        # Drop the oldest entry to keep the cache bounded
+        if len(self._ocr_cache) >= _OCR_CACHE_SIZE:
+            del self._ocr_cache[next(iter(self._ocr_cache))]
+        self._ocr_cache[key] = results
+        
+        return results
     
     async def extract_text(self, file_path: str) -> str:
         """Extract text from image using OCR"""
         try:
-            import easyocr
+            results = await self._ocr(file_path)
             
-            # Initialize OCR reader (English by default)
-            reader = easyocr.Reader(['en'])
-            
-            # Extract text from image
-            results = reader.readtext(file_path)
-            
-            # Combine all text results
-            extracted_text = ""
-            for (bbox, text, confidence) in results:
-                if confidence > 0.5:  # Only include text with decent confidence
-                    extracted_text += text + " "
+            # Combine all text results, only including text with decent confidence
+            extracted_text = " ".join(text for _, text, confidence in results if confidence > 0.5)
             
             logger.info(f"Extracted {len(extracted_text)} characters from image via OCR")
-            return extracted_text.strip()
+            return extracted_text
             
         except ImportError:
             logger.error("EasyOCR not installed. Install with: pip install easyocr")
@@ -42,44 +164,54 @@ class ImageProcessor(BaseProcessor):
             logger.error(f"Error extracting text from image: {e}")
             raise Exception(f"Failed to extract text from image: {str(e)}")
     
-    async def apply_redactions(self, file_path: str, redactions: List[Dict[str, Any]], output_path: str) -> bool:
-        """Apply redactions to image by drawing black rectangles over sensitive areas"""
-        try:
-            from PIL import Image, ImageDraw
-            import easyocr
+    async def apply_redactions(self, file_path: str, redactions: List[Suggestion], output_path: str,
+                               ocr_results: Optional[List[tuple]] = None) -> bool:
+        """
+        Apply redactions to image by drawing black rectangles over sensitive areas
+        
+        Args:
+            file_path: Original file path
+            redactions: List of redaction instructions
+            output_path: Where to save the redacted file
+            ocr_results: OCR results for the image, computed if not given
             
-            # Open image
-            image = Image.open(file_path)
-            draw = ImageDraw.Draw(image)
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            if not _AVAILABLE:
+                raise ImportError(_IMPORT_ERROR)
             
-            # Initialize OCR reader to get text positions
-            reader = easyocr.Reader(['en'])
-            ocr_results = reader.readtext(file_path)
+            # Get text positions, reusing the OCR pass from text extraction
+            if ocr_results is None:
+                ocr_results = await self._ocr(file_path)
             
-            # Apply redactions
-            redacted_count = 0
+            # Build a single automaton over all redaction terms
+            automaton = ahocorasick.Automaton()
             for redaction in redactions:
-                text_to_redact = redaction.get('text', '').strip()
-                if not text_to_redact:
-                    continue
+                text_to_redact = redaction.text.strip().lower()
+                if text_to_redact:
+                    automaton.add_word(text_to_redact, text_to_redact)
+            
+            # Collect the boxes to redact
+            rects = []
+            if len(automaton) > 0:
+                automaton.make_automaton()
                 
-                # Find matching text in OCR results
+                # Find matching text in OCR results with one scan per box
                 for (bbox, detected_text, confidence) in ocr_results:
-                    if confidence > 0.5 and text_to_redact.lower() in detected_text.lower():
-                        # Draw black rectangle over the text
+                    if confidence > 0.5 and next(automaton.iter(detected_text.lower()), None) is not None:
                         # bbox is in format: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
                         x_coords = [point[0] for point in bbox]
                         y_coords = [point[1] for point in bbox]
-                        
-                        min_x, max_x = min(x_coords), max(x_coords)
-                        min_y, max_y = min(y_coords), max(y_coords)
-                        
-                        # Draw filled black rectangle
-                        draw.rectangle([min_x, min_y, max_x, max_y], fill='black')
-                        redacted_count += 1
+                        rects.append((
+                            max(int(min(x_coords)), 0), max(int(min(y_coords)), 0),
+                            int(max(x_coords)) + 1, int(max(y_coords)) + 1
+                        ))
             
-            # Save redacted image
-            image.save(output_path)
+            # Decoding, painting and encoding the image is CPU bound, so keep it off the event loop
+            await asyncio.to_thread(_paint_rects, file_path, rects, output_path)
+            redacted_count = len(rects)
             
             logger.info(f"Applied {redacted_count} redactions to image, saved to {output_path}")
             return True
@@ -94,8 +226,9 @@ class ImageProcessor(BaseProcessor):
     async def process_file(self, file_path: str, ollama_service) -> ProcessingResult:
         """Complete processing workflow for image files"""
         try:
-            # Extract text using OCR
+            # Extract text using OCR, keeping the results for redaction
             extracted_text = await self.extract_text(file_path)
+            ocr_results = await self._ocr(file_path)
             
             if not extracted_text.strip():
                 return ProcessingResult(
@@ -105,8 +238,16 @@ class ImageProcessor(BaseProcessor):
                     pii_found=False
                 )
             
-            # Analyze for PII using Ollama
-            pii_analysis = await ollama_service.analyze_text_for_pii(extracted_text)
+            # Analyze for PII and generate redactions using Ollama
+            pii_analysis = await ollama_service.analyze_and_suggest(extracted_text)
+            
+            # A failed analysis (of any chunk) says nothing about the text, so never
+            # report it as clean
+            if 'error' in pii_analysis:
+                return ProcessingResult(
+                    success=False,
+                    message=f"PII analysis failed, manual review required: {pii_analysis['error']}"
+                )
             
             if not pii_analysis.get('found_pii', False):
                 return ProcessingResult(
@@ -116,10 +257,7 @@ class ImageProcessor(BaseProcessor):
                     pii_found=False
                 )
             
-            # Generate redactions
-            redaction_suggestions = await ollama_service.generate_redaction_suggestions(pii_analysis)
-            
-            if not redaction_suggestions.get('needs_redaction', False):
+            if not pii_analysis.get('needs_redaction', False):
                 return ProcessingResult(
                     success=True,
                     message="No redactions needed based on confidence threshold",
@@ -130,23 +268,24 @@ class ImageProcessor(BaseProcessor):
             
             # Create output file
             file_extension = os.path.splitext(file_path)[1]
-            output_path = await self.create_temp_file(f"redacted_{os.path.basename(file_path)}")
+            output_path = self.create_temp_file(f"redacted_{os.path.basename(file_path)}")
             
             # Apply redactions
             success = await self.apply_redactions(
                 file_path, 
-                redaction_suggestions['suggestions'], 
-                output_path
+                pii_analysis['suggestions'], 
+                output_path,
+                ocr_results=ocr_results
             )
             
             if success:
                 return ProcessingResult(
                     success=True,
-                    message=f"Successfully redacted {len(redaction_suggestions['suggestions'])} sensitive items from image",
+                    message=f"Successfully redacted {len(pii_analysis['suggestions'])} sensitive items from image",
                     extracted_text=extracted_text,
                     output_file=output_path,
                     pii_found=True,
-                    redaction_count=len(redaction_suggestions['suggestions'])
+                    redaction_count=len(pii_analysis['suggestions'])
                 )
             else:
                 return ProcessingResult(
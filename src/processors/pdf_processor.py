@@ -1,34 +1,159 @@
 """
 PDF file processor using PyMuPDF (fitz)
 """
+import asyncio
+import bisect
 import logging
+import multiprocessing
 import os
-from typing import Dict, Any, List
-from .base_processor import BaseProcessor, ProcessingResult
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+from .base_processor import BaseProcessor, ProcessingResult, Suggestion
+
+try:
+    import fitz  # PyMuPDF
+    _AVAILABLE = True
+except ImportError:
+    _AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# PDFs with fewer pages than this are extracted in a single worker thread
+_PARALLEL_MIN_PAGES = 16
+
+# Fewest pages worth handing to a separate worker process
+_PAGES_PER_WORKER = 8
+
+_EXECUTOR: Optional[ProcessPoolExecutor] = None
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Get the shared process pool used for page extraction"""
+    global _EXECUTOR
+    
+    if _EXECUTOR is None:
+        # The bot process is multi-threaded (and may be inside MuPDF) by the time
+        # the pool is created, so start fresh workers instead of forking it
+        _EXECUTOR = ProcessPoolExecutor(
+            max_workers=os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    
+    return _EXECUTOR
+
+def shutdown_executor() -> None:
+    """Shut down the shared page extraction pool, if it was started"""
+    global _EXECUTOR
+    
+    if _EXECUTOR is not None:
+        _EXECUTOR.shutdown(cancel_futures=True)
+        _EXECUTOR = None
+
+def _count_pages(file_path: str) -> int:
+    """Count the pages in a PDF file"""
+    with fitz.open(file_path) as doc:
+        return len(doc)
+
+def _extract_pages(file_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) from a PDF file"""
+    with fitz.open(file_path) as doc:
+        return [page.get_text("text", sort=False) for page in doc.pages(start, stop)]
+
+def _redact_pdf(file_path: str, terms: Dict[str, str], output_path: str) -> None:
+    """
+    Redact terms from a PDF file and save the result
+    
+    Args:
+        file_path: Original file path
+        terms: Mapping of lowercased term to the whitespace-normalised term
+        output_path: Where to save the redacted file
+    """
+    pattern = re.compile(
+        "|".join(map(re.escape, sorted(terms.values(), key=len, reverse=True))),
+        re.IGNORECASE
+    )
+    
+    # The word buffer can miss terms with punctuation in them, e.g. a
+    # hyphenated name broken across lines, so only those get a text search
+    fallback_terms = {key: term for key, term in terms.items() if re.search(r'[^\w\s]', term)}
+    
+    with fitz.open(file_path) as doc:
+        for page_num in range(len(doc)):
+            page = doc.load_page(page_num)
+            
+            # Parse the page text once and reuse it for every lookup below
+            textpage = page.get_textpage()
+            
+            # Build the page text from its words, remembering where each word starts
+            # words are in format: (x0, y0, x1, y1, word, block_no, line_no, word_no)
+            words = page.get_text("words", textpage=textpage)
+            if not words:
+                continue
+            
+            starts = []
+            offset = 0
+            for word in words:
+                starts.append(offset)
+                offset += len(word[4]) + 1
+            page_text = " ".join(word[4] for word in words)
+            
+            # Redact every word touched by a match
+            found = set()
+            for match in pattern.finditer(page_text):
+                found.add(match.group().lower())
+                first = bisect.bisect_right(starts, match.start()) - 1
+                last = bisect.bisect_left(starts, match.end())
+                for word in words[first:last]:
+                    page.add_redact_annot(fitz.Rect(word[:4]), fill=(0, 0, 0))  # Black redaction
+            
+            # Terms the word buffer may have missed fall back to a text search
+            for key, term in fallback_terms.items():
+                if key not in found:
+                    for inst in page.search_for(term, textpage=textpage):
+                        page.add_redact_annot(inst, fill=(0, 0, 0))
+            
+            # Apply redactions
+            page.apply_redactions()
+        
+        # Save the redacted document, dropping unused objects and compressing
+        # streams so less has to be written and uploaded back to Telegram
+        doc.save(output_path, garbage=4, deflate=True, deflate_images=True, clean=True)
+
 class PDFProcessor(BaseProcessor):
     """Processor for PDF files"""
     
     def __init__(self):
         super().__init__()
         self.supported_extensions = ['pdf']
+        
+        if not _AVAILABLE:
+            logger.warning("PyMuPDF (fitz) not installed, PDF processing is unavailable")
     
     async def extract_text(self, file_path: str) -> str:
         """Extract text from PDF file"""
         try:
-            import fitz  # PyMuPDF
+            if not _AVAILABLE:
+                raise ImportError("PyMuPDF (fitz) not installed")
             
-            doc = fitz.open(file_path)
-            text_content = ""
+            loop = asyncio.get_running_loop()
+            page_count = await loop.run_in_executor(None, _count_pages, file_path)
             
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                text_content += page.get_text()
-                text_content += "\n---PAGE BREAK---\n"
+            if page_count < _PARALLEL_MIN_PAGES:
+                # Not worth the process pool overhead, just keep it off the event loop
+                pages = await loop.run_in_executor(None, _extract_pages, file_path, 0, page_count)
+            else:
+                # Split the pages into one contiguous range per worker, only
+                # using (and so starting) as many workers as the pages justify
+                workers = min(os.cpu_count() or 1, page_count // _PAGES_PER_WORKER)
+                step = -(-page_count // workers)
+                chunks = await asyncio.gather(*[
+                    loop.run_in_executor(_get_executor(), _extract_pages, file_path, start, min(start + step, page_count))
+                    for start in range(0, page_count, step)
+                ])
+                pages = [text for chunk in chunks for text in chunk]
             
-            doc.close()
+            text_content = "\n---PAGE BREAK---\n".join(pages)
             logger.info(f"Extracted {len(text_content)} characters from PDF")
             return text_content
             
@@ -39,37 +164,27 @@ class PDFProcessor(BaseProcessor):
             logger.error(f"Error extracting text from PDF: {e}")
             raise Exception(f"Failed to extract text from PDF: {str(e)}")
     
-    async def apply_redactions(self, file_path: str, redactions: List[Dict[str, Any]], output_path: str) -> bool:
+    async def apply_redactions(self, file_path: str, redactions: List[Suggestion], output_path: str) -> bool:
         """Apply redactions to PDF file"""
         try:
-            import fitz
+            if not _AVAILABLE:
+                raise ImportError("PyMuPDF (fitz) not installed")
             
-            doc = fitz.open(file_path)
+            # Match every redaction term in one pass, longest terms first.
+            # Whitespace is normalised to match the word buffer _redact_pdf builds
+            # and case is ignored like page.search_for does, so terms that
+            # only differ in case are deduplicated.
+            terms = {}
+            for redaction in redactions:
+                term = " ".join(redaction.text.split())
+                if term:
+                    terms.setdefault(term.lower(), term)
+            if not terms:
+                await asyncio.to_thread(shutil.copyfile, file_path, output_path)
+                return True
             
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                
-                # Find and redact text on each page
-                for redaction in redactions:
-                    text_to_redact = redaction.get('text', '')
-                    if not text_to_redact:
-                        continue
-                    
-                    # Search for text instances on the page
-                    text_instances = page.search_for(text_to_redact)
-                    
-                    for inst in text_instances:
-                        # Create redaction annotation
-                        redact_annot = page.add_redact_annot(inst)
-                        redact_annot.set_colors(stroke=None, fill=(0, 0, 0))  # Black redaction
-                        redact_annot.update()
-                
-                # Apply redactions
-                page.apply_redactions()
-            
-            # Save the redacted document
-            doc.save(output_path)
-            doc.close()
+            # Redacting and saving (recompressing every stream) is slow, so keep it off the event loop
+            await asyncio.to_thread(_redact_pdf, file_path, terms, output_path)
             
             logger.info(f"Applied {len(redactions)} redactions to PDF, saved to {output_path}")
             return True
@@ -90,8 +205,16 @@ class PDFProcessor(BaseProcessor):
                     message="No text found in PDF file"
                 )
             
-            # Analyze for PII using Ollama
-            pii_analysis = await ollama_service.analyze_text_for_pii(extracted_text)
+            # Analyze for PII and generate redactions using Ollama
+            pii_analysis = await ollama_service.analyze_and_suggest(extracted_text)
+            
+            # A failed analysis (of any chunk) says nothing about the text, so never
+            # report it as clean
+            if 'error' in pii_analysis:
+                return ProcessingResult(
+                    success=False,
+                    message=f"PII analysis failed, manual review required: {pii_analysis['error']}"
+                )
             
             if not pii_analysis.get('found_pii', False):
                 return ProcessingResult(
@@ -101,10 +224,7 @@ class PDFProcessor(BaseProcessor):
                     pii_found=False
                 )
             
-            # Generate redactions
-            redaction_suggestions = await ollama_service.generate_redaction_suggestions(pii_analysis)
-            
-            if not redaction_suggestions.get('needs_redaction', False):
+            if not pii_analysis.get('needs_redaction', False):
                 return ProcessingResult(
                     success=True,
                     message="No redactions needed based on confidence threshold",
@@ -114,23 +234,23 @@ class PDFProcessor(BaseProcessor):
                 )
             
             # Create output file
-            output_path = await self.create_temp_file(f"redacted_{os.path.basename(file_path)}")
+            output_path = self.create_temp_file(f"redacted_{os.path.basename(file_path)}")
             
             # Apply redactions
             success = await self.apply_redactions(
                 file_path, 
-                redaction_suggestions['suggestions'], 
+                pii_analysis['suggestions'], 
                 output_path
             )
             
             if success:
                 return ProcessingResult(
                     success=True,
-                    message=f"Successfully redacted {len(redaction_suggestions['suggestions'])} sensitive items",
+                    message=f"Successfully redacted {len(pii_analysis['suggestions'])} sensitive items",
                     extracted_text=extracted_text,
                     output_file=output_path,
                     pii_found=True,
-                    redaction_count=len(redaction_suggestions['suggestions'])
+                    redaction_count=len(pii_analysis['suggestions'])
                 )
             else:
                 return ProcessingResult(
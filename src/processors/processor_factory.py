@@ -14,14 +14,17 @@ class ProcessorFactory:
     """Factory class to create appropriate processors for different file types"""
     
     def __init__(self):
+        # One shared instance per processor type
+        image_processor = ImageProcessor()
+        
         self._processors = {
             'txt': TextProcessor(),
             'pdf': PDFProcessor(), 
-            'jpg': ImageProcessor(),
-            'jpeg': ImageProcessor(),
-            'png': ImageProcessor(),
-            'gif': ImageProcessor(),
-            'bmp': ImageProcessor(),
+            'jpg': image_processor,
+            'jpeg': image_processor,
+            'png': image_processor,
+            'gif': image_processor,
+            'bmp': image_processor,
         }
         
         # TODO: Add these when we implement them
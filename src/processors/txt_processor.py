@@ -1,62 +1,226 @@
 """
 Text file processor
 """
+import asyncio
+import codecs
+import hashlib
 import logging
 import os
-from typing import Dict, Any, List
-from .base_processor import BaseProcessor, ProcessingResult
+import re
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+import aiofiles
+import regex
+from .base_processor import BaseProcessor, ProcessingResult, Suggestion
+
+try:
+    import ahocorasick
+    _AHOCORASICK_AVAILABLE = True
+except ImportError:
+    _AHOCORASICK_AVAILABLE = False
+
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
 
 logger = logging.getLogger(__name__)
 
+# Files larger than this are redacted in chunks instead of being read whole
+_STREAM_MIN_SIZE = 8 * 1024 * 1024
+_STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Number of recent redaction matchers kept per processor
+_MATCHER_CACHE_SIZE = 32
+
+# Cheap signs that text may contain PII: digits, @, an uppercase letter
+# starting a word that follows another word (names mid-sentence or in a
+# row, in any script), or a run of capitals (all-caps names). Only text
+# with none of these, i.e. lowercase prose apart from sentence starts,
+# skips the LLM. PII written entirely in lowercase is not caught here.
+_PII_INDICATORS = regex.compile(r'[\d@]|\w\s+\p{Lu}|\p{Lu}{2,}')
+
+class _RedactionMatcher:
+    """Finds all redaction terms in a text in a single pass"""
+    
+    def __init__(self, replacements: Dict[str, str]):
+        """
+        Args:
+            replacements: Mapping of text to redact to its replacement
+        """
+        if _AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for text, replacement in replacements.items():
+                self._automaton.add_word(text, (len(text), replacement))
+            self._automaton.make_automaton()
+        else:
+            # Longest terms first so the alternation prefers the longest match
+            self._automaton = None
+            self._replacements = replacements
+            self._pattern = re.compile(
+                "|".join(map(re.escape, sorted(replacements, key=len, reverse=True)))
+            )
+    
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """Yield (start, end, replacement) for leftmost-longest, non-overlapping matches"""
+        if self._automaton is not None:
+            # The automaton reports every (possibly overlapping) match by end
+            # position, keep the longest match at each leftmost start
+            matches = sorted(
+                (end - length + 1, -length, replacement)
+                for end, (length, replacement) in self._automaton.iter(text)
+            )
+            pos = 0
+            for start, neg_length, replacement in matches:
+                if start >= pos:
+                    pos = start - neg_length
+                    yield start, pos, replacement
+        else:
+            for match in self._pattern.finditer(text):
+                yield match.start(), match.end(), self._replacements[match.group()]
+    
+    def replace(self, text: str) -> str:
+        """Replace every match in the text, building the output once"""
+        return _splice(text, self.finditer(text))
+
+def _validated_spans(content: str, redactions: List[Suggestion]) -> Optional[List[Tuple[int, int, str]]]:
+    """
+    Get (start, end, replacement) spans from the positions reported with each redaction
+    
+    Positions from the LLM are only used when every one of them points at its
+    text, none of them overlap, and together they cover every occurrence of
+    each text, so the result is never less redacted than a full search.
+    
+    Returns:
+        Spans sorted by start position, or None if the positions can't be trusted
+    """
+    spans = []
+    for redaction in redactions:
+        text = redaction.text
+        if not text:
+            continue
+        
+        positions = redaction.spans
+        if not positions or len(positions) != content.count(text):
+            return None
+        
+        replacement = redaction.replacement
+        for start, end in positions:
+            if start < 0 or content[start:end] != text:
+                return None
+            spans.append((start, end, replacement))
+    
+    if not spans:
+        return None
+    
+    spans.sort()
+    for (_, prev_end, _), (start, _, _) in zip(spans, spans[1:]):
+        if start < prev_end:
+            return None
+    
+    return spans
+
+def _is_utf8(file_path: str) -> bool:
+    """Check whether a file is valid UTF-8, reading it in chunks"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as file:
+            while chunk := file.read(_STREAM_CHUNK_SIZE):
+                decoder.decode(chunk)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _splice(content: str, spans: Iterable[Tuple[int, int, str]]) -> str:
+    """Replace sorted, non-overlapping (start, end, replacement) spans in one pass"""
+    parts = []
+    pos = 0
+    for start, end, replacement in spans:
+        parts.append(content[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(content[pos:])
+    return "".join(parts)
+
 class TextProcessor(BaseProcessor):
     """Processor for plain text files"""
     
     def __init__(self):
         super().__init__()
         self.supported_extensions = ['txt']
+        self._matchers: "OrderedDict[bytes, _RedactionMatcher]" = OrderedDict()
+    
+    async def _read_text(self, file_path: str) -> str:
+        """Read a text file without blocking the event loop, decoding it once"""
+        async with aiofiles.open(file_path, 'rb') as file:
+            raw = await file.read()
+        
+        try:
+            return raw.decode('utf-8')
+        except UnicodeDecodeError:
+            pass
+        
+        # Detect the encoding from the bytes already read
+        match = charset_normalizer.from_bytes(raw).best() if charset_normalizer else None
+        if match is not None:
+            logger.info(f"Text file is not valid UTF-8, decoding as {match.encoding}")
+            return str(match)
+        
+        # latin-1 can decode any bytes
+        logger.info("Text file is not valid UTF-8, decoding as latin-1")
+        return raw.decode('latin-1')
     
     async def extract_text(self, file_path: str) -> str:
         """Extract text from text file"""
         try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
+            content = await self._read_text(file_path)
             
             logger.info(f"Extracted {len(content)} characters from text file")
             return content
             
-        except UnicodeDecodeError:
-            # Try with different encoding
-            try:
-                with open(file_path, 'r', encoding='latin-1') as file:
-                    content = file.read()
-                logger.info(f"Extracted {len(content)} characters from text file (latin-1)")
-                return content
-            except Exception as e:
-                logger.error(f"Error reading text file with latin-1 encoding: {e}")
-                raise Exception(f"Failed to read text file: {str(e)}")
         except Exception as e:
             logger.error(f"Error extracting text from file: {e}")
             raise Exception(f"Failed to extract text: {str(e)}")
     
-    async def apply_redactions(self, file_path: str, redactions: List[Dict[str, Any]], output_path: str) -> bool:
+    async def apply_redactions(self, file_path: str, redactions: List[Suggestion], output_path: str) -> bool:
         """Apply redactions to text file"""
+        # Write to a temporary file first so a crash never leaves a partial output
+        temp_path = output_path + '.tmp'
+        
         try:
-            # Read original content
-            with open(file_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-            
-            # Apply redactions by replacing text
-            redacted_content = content
+            # Apply redactions by replacing text in a single pass
+            replacements = {}
             for redaction in redactions:
-                text_to_redact = redaction.get('text', '')
-                replacement = redaction.get('replacement', '[REDACTED]')
+                if redaction.text:
+                    replacements.setdefault(redaction.text, redaction.replacement)
+            
+            # Large files are streamed through the matcher to bound memory. Only
+            # UTF-8 is streamed, anything else goes through _read_text below so it
+            # is decoded exactly like the text the LLM was shown.
+            if (replacements and os.path.getsize(file_path) > _STREAM_MIN_SIZE
+                    and await asyncio.to_thread(_is_utf8, file_path)):
+                await self._stream_redactions(file_path, replacements, temp_path)
+            else:
+                # Read original content
+                content = await self._read_text(file_path)
+                
+                # Splice directly at the positions reported by the LLM when they
+                # can be trusted, otherwise search for the terms
+                spans = _validated_spans(content, redactions)
+                if spans is not None:
+                    redacted_content = _splice(content, spans)
+                elif replacements:
+                    redacted_content = self._get_matcher(replacements).replace(content)
+                else:
+                    redacted_content = content
                 
-                if text_to_redact:
-                    redacted_content = redacted_content.replace(text_to_redact, replacement)
+                # Save redacted content
+                async with aiofiles.open(temp_path, 'w', encoding='utf-8') as file:
+                    await file.write(redacted_content)
             
-            # Save redacted content
-            with open(output_path, 'w', encoding='utf-8') as file:
-                file.write(redacted_content)
+            # Move the finished file into place in one atomic rename
+            await asyncio.to_thread(os.replace, temp_path, output_path)
             
             logger.info(f"Applied {len(redactions)} redactions to text file, saved to {output_path}")
             return True
@@ -64,6 +228,63 @@ class TextProcessor(BaseProcessor):
         except Exception as e:
             logger.error(f"Error applying redactions to text file: {e}")
             return False
+        finally:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+    
+    async def _stream_redactions(self, file_path: str, replacements: Dict[str, str], output_path: str) -> None:
+        """
+        Apply replacements to a file chunk by chunk
+        
+        The file must be valid UTF-8 (see _is_utf8). Matches are only taken when they
+        start before the last (longest term - 1) characters of the buffer, which
+        guarantees they lie entirely inside it; the rest of the buffer is carried
+        over to the next chunk.
+        """
+        matcher = self._get_matcher(replacements)
+        max_length = max(len(text) for text in replacements)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        
+        async with aiofiles.open(file_path, 'rb') as source, aiofiles.open(output_path, 'wb') as target:
+            carry = ""
+            done = False
+            while not done:
+                chunk = await source.read(_STREAM_CHUNK_SIZE)
+                done = not chunk
+                buffer = carry + decoder.decode(chunk, final=done)
+                cut = len(buffer) if done else max(len(buffer) - max_length + 1, 0)
+                
+                parts = []
+                pos = 0
+                for start, end, replacement in matcher.finditer(buffer):
+                    if start >= cut:
+                        break
+                    parts.append(buffer[pos:start])
+                    parts.append(replacement)
+                    pos = end
+                
+                if pos < cut:
+                    parts.append(buffer[pos:cut])
+                    pos = cut
+                carry = buffer[pos:]
+                
+                await target.write("".join(parts).encode('utf-8'))
+    
+    def _get_matcher(self, replacements: Dict[str, str]) -> _RedactionMatcher:
+        """Get a matcher for a set of replacements, reusing one built earlier"""
+        # repr() of the sorted pairs is unambiguous, hash it to a short fixed-size key
+        key = hashlib.blake2b(repr(sorted(replacements.items())).encode('utf-8'), digest_size=16).digest()
+        
+        matcher = self._matchers.get(key)
+        if matcher is not None:
+            self._matchers.move_to_end(key)
+            return matcher
+        
+        # Drop the least recently used matcher to keep the cache bounded
+        if len(self._matchers) >= _MATCHER_CACHE_SIZE:
+            self._matchers.popitem(last=False)
+        matcher = self._matchers[key] = _RedactionMatcher(replacements)
+        return matcher
     
     async def process_file(self, file_path: str, ollama_service) -> ProcessingResult:
         """Complete processing workflow for text files"""
@@ -71,63 +292,161 @@ class TextProcessor(BaseProcessor):
             # Extract text
             extracted_text = await self.extract_text(file_path)
             
-            if not extracted_text.strip():
-                return ProcessingResult(
-                    success=False,
-                    message="No text content found in file"
-                )
-            
-            # Analyze for PII using Ollama
-            pii_analysis = await ollama_service.analyze_text_for_pii(extracted_text)
-            
-            if not pii_analysis.get('found_pii', False):
-                return ProcessingResult(
-                    success=True,
-                    message="No sensitive information detected in text file",
-                    extracted_text=extracted_text,
-                    pii_found=False
-                )
-            
-            # Generate redactions
-            redaction_suggestions = await ollama_service.generate_redaction_suggestions(pii_analysis)
+            result, pii_analysis = await self._analyze(extracted_text, ollama_service)
+            if result is not None:
+                return result
             
-            if not redaction_suggestions.get('needs_redaction', False):
-                return ProcessingResult(
-                    success=True,
-                    message="No redactions needed based on confidence threshold",
-                    extracted_text=extracted_text,
-                    pii_found=True,
-                    redaction_count=0
-                )
+            return await self._redact(file_path, extracted_text, pii_analysis)
+                
+        except Exception as e:
+            return self._error_result(e)
+    
+    async def process_many(self, file_paths: List[str], ollama_service, concurrency: int = 4) -> List[ProcessingResult]:
+        """
+        Process several text files as a pipeline
+        
+        Extraction, analysis and redaction run as separate stages connected by
+        queues, so one file's (disk bound) extraction or redaction overlaps with
+        another file's (LLM bound) analysis.
+        
+        Args:
+            file_paths: Paths of the files to process
+            ollama_service: Service used for PII analysis
+            concurrency: Number of workers per stage
             
-            # Create output file
-            output_path = await self.create_temp_file(f"redacted_{os.path.basename(file_path)}")
+        Returns:
+            Processing results in the same order as file_paths
+        """
+        results: List[Optional[ProcessingResult]] = [None] * len(file_paths)
+        # Queues after extraction are bounded, so extraction can only run a
+        # few files ahead of analysis instead of reading every file into memory
+        paths_q: asyncio.Queue = asyncio.Queue()
+        extracted_q: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        analyzed_q: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+        
+        async def extract(index, file_path):
+            await extracted_q.put((index, file_path, await self.extract_text(file_path)))
+        
+        async def analyze(index, file_path, extracted_text):
+            result, pii_analysis = await self._analyze(extracted_text, ollama_service)
+            if result is not None:
+                results[index] = result
+            else:
+                await analyzed_q.put((index, file_path, extracted_text, pii_analysis))
+        
+        async def redact(index, file_path, extracted_text, pii_analysis):
+            results[index] = await self._redact(file_path, extracted_text, pii_analysis)
+        
+        async def run_stage(inbox, outbox, handler):
+            async def worker():
+                # None marks the end of the stage's input
+                while (item := await inbox.get()) is not None:
+                    try:
+                        await handler(*item)
+                    except Exception as e:
+                        results[item[0]] = self._error_result(e)
             
-            # Apply redactions
-            success = await self.apply_redactions(
-                file_path, 
-                redaction_suggestions['suggestions'], 
-                output_path
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            if outbox is not None:
+                for _ in range(concurrency):
+                    await outbox.put(None)
+        
+        for item in enumerate(file_paths):
+            paths_q.put_nowait(item)
+        for _ in range(concurrency):
+            paths_q.put_nowait(None)
+        
+        await asyncio.gather(
+            run_stage(paths_q, extracted_q, extract),
+            run_stage(extracted_q, analyzed_q, analyze),
+            run_stage(analyzed_q, None, redact),
+        )
+        
+        return results
+    
+    async def _analyze(self, extracted_text: str, ollama_service) -> Tuple[Optional[ProcessingResult], Dict[str, Any]]:
+        """
+        Analyze extracted text for PII
+        
+        Returns:
+            Tuple of (final result if there is nothing to redact, PII analysis)
+        """
+        if not extracted_text.strip():
+            return ProcessingResult(
+                success=False,
+                message="No text content found in file"
+            ), {}
+        
+        # Skip the (slow) LLM call for text with no sign of PII
+        if not _PII_INDICATORS.search(extracted_text):
+            return ProcessingResult(
+                success=True,
+                message="No PII indicators found in text file",
+                extracted_text=extracted_text,
+                pii_found=False
+            ), {}
+        
+        # Analyze for PII and generate redactions using Ollama
+        pii_analysis = await ollama_service.analyze_and_suggest(extracted_text)
+        
+        # A failed analysis (of any chunk) says nothing about the text, so never
+        # report it as clean
+        if 'error' in pii_analysis:
+            return ProcessingResult(
+                success=False,
+                message=f"PII analysis failed, manual review required: {pii_analysis['error']}"
+            ), pii_analysis
+        
+        if not pii_analysis.get('found_pii', False):
+            return ProcessingResult(
+                success=True,
+                message="No sensitive information detected in text file",
+                extracted_text=extracted_text,
+                pii_found=False
+            ), pii_analysis
+        
+        if not pii_analysis.get('needs_redaction', False):
+            return ProcessingResult(
+                success=True,
+                message="No redactions needed based on confidence threshold",
+                extracted_text=extracted_text,
+                pii_found=True,
+                redaction_count=0
+            ), pii_analysis
+        
+        return None, pii_analysis
+    
+    async def _redact(self, file_path: str, extracted_text: str, pii_analysis: Dict[str, Any]) -> ProcessingResult:
+        """Apply the suggested redactions to a file"""
+        # Create output file
+        output_path = self.create_temp_file(f"redacted_{os.path.basename(file_path)}")
+        
+        # Apply redactions
+        success = await self.apply_redactions(
+            file_path, 
+            pii_analysis['suggestions'], 
+            output_path
+        )
+        
+        if success:
+            return ProcessingResult(
+                success=True,
+                message=f"Successfully redacted {len(pii_analysis['suggestions'])} sensitive items",
+                extracted_text=extracted_text,
+                output_file=output_path,
+                pii_found=True,
+                redaction_count=len(pii_analysis['suggestions'])
             )
-            
-            if success:
-                return ProcessingResult(
-                    success=True,
-                    message=f"Successfully redacted {len(redaction_suggestions['suggestions'])} sensitive items",
-                    extracted_text=extracted_text,
-                    output_file=output_path,
-                    pii_found=True,
-                    redaction_count=len(redaction_suggestions['suggestions'])
-                )
-            else:
-                return ProcessingResult(
-                    success=False,
-                    message="Failed to apply redactions to text file"
-                )
-                
-        except Exception as e:
-            logger.error(f"Error processing text file: {e}")
+        else:
             return ProcessingResult(
                 success=False,
-                message=f"Error processing text file: {str(e)}"
-            )
\ No newline at end of file
+                message="Failed to apply redactions to text file"
+            )
+    
+    def _error_result(self, error: Exception) -> ProcessingResult:
+        """Build the result for a file that failed to process"""
+        logger.error(f"Error processing text file: {error}")
+        return ProcessingResult(
+            success=False,
+            message=f"Error processing text file: {str(error)}"
+        )
\ No newline at end of file
@@ -1,22 +1,49 @@
 """
 File service for handling file downloads, uploads, and management
 """
+import asyncio
 import logging
 import os
-import tempfile
+import re
+import uuid
+import aiofiles
 import aiohttp
 from typing import Optional, Tuple
+from urllib.parse import urlparse
 from telegram import Document, PhotoSize
-from src.config import Config
+from src.config import config
 
 logger = logging.getLogger(__name__)
 
+# Size of the chunks streamed from Telegram to disk
+_DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Limits for a single download from Telegram, in seconds
+_DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=300, sock_connect=30, sock_read=60)
+
 class FileService:
     """Service for handling file operations"""
     
+    # Limits derived from the (immutable) configuration once at import
+    _MAX_BYTES = config.max_file_size_mb * 1024 * 1024
+    _SUPPORTED = frozenset(ext.strip().lower() for ext in config.supported_formats)
+    
     def __init__(self):
         self.temp_dir = os.path.join(os.getcwd(), 'temp')
         os.makedirs(self.temp_dir, exist_ok=True)
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(raise_for_status=True, timeout=_DOWNLOAD_TIMEOUT)
+        return self._session
+    
+    async def close(self) -> None:
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     async def download_telegram_file(self, telegram_file, original_filename: str = None) -> Tuple[str, str]:
         """
@@ -30,33 +57,47 @@ class FileService:
             Tuple of (local_file_path, filename)
         """
         try:
-            # Create a temporary file
-            if original_filename:
-                temp_file = tempfile.NamedTemporaryFile(
-                    dir=self.temp_dir,
-                    suffix=f"_{original_filename}",
-                    delete=False
-                )
-            else:
-                temp_file = tempfile.NamedTemporaryFile(
-                    dir=self.temp_dir,
-                    delete=False
-                )
-            
-            temp_file.close()
+            # Build a unique path directly, download_to_drive creates the file
+            safe_filename = re.sub(r'[^\w.\-]', '_', original_filename or '')
+            file_path = os.path.join(self.temp_dir, f"{uuid.uuid4().hex}_{safe_filename}")
             
-            # Download the file
-            await telegram_file.download_to_drive(temp_file.name)
+            # Download the file, streaming it straight to disk. A bot API server in
+            # local mode hands out paths on its own filesystem instead of URLs.
+            if urlparse(telegram_file.file_path or '').scheme in ('http', 'https'):
+                await self._stream_to_disk(telegram_file.file_path, file_path)
+            else:
+                await telegram_file.download_to_drive(file_path)
             
-            filename = original_filename or os.path.basename(temp_file.name)
-            logger.info(f"Downloaded Telegram file: {filename} -> {temp_file.name}")
+            filename = original_filename or os.path.basename(file_path)
+            logger.info(f"Downloaded Telegram file: {filename} -> {file_path}")
             
-            return temp_file.name, filename
+            return file_path, filename
             
         except Exception as e:
             logger.error(f"Error downloading Telegram file: {e}")
             raise Exception(f"Failed to download file: {str(e)}")
     
+    async def _stream_to_disk(self, url: str, file_path: str) -> None:
+        """
+        Stream a URL to a file, writing each chunk as it arrives
+        
+        Telegram file URLs contain the bot token, so errors are re-raised
+        without the URL (and without chaining the original exception).
+        """
+        try:
+            async with self._get_session().get(url) as response, aiofiles.open(file_path, 'wb') as file:
+                async for chunk in response.content.iter_chunked(_DOWNLOAD_CHUNK_SIZE):
+                    await file.write(chunk)
+        except BaseException as e:
+            self.cleanup_file(file_path)
+            if isinstance(e, aiohttp.ClientResponseError):
+                raise Exception(f"Telegram file server returned HTTP {e.status}") from None
+            if isinstance(e, aiohttp.ClientError):
+                raise Exception(f"Telegram file download failed ({type(e).__name__})") from None
+            if isinstance(e, asyncio.TimeoutError):
+                raise Exception("Telegram file download timed out") from None
+            raise
+    
     async def download_document(self, document: Document) -> Tuple[str, str]:
         """Download a Telegram document"""
         file = await document.get_file()
@@ -70,8 +111,7 @@ class FileService:
     
     def validate_file_size(self, file_size: int) -> bool:
         """Validate file size against limits"""
-        max_bytes = Config.MAX_FILE_SIZE_MB * 1024 * 1024
-        return file_size <= max_bytes
+        return file_size <= self._MAX_BYTES
     
     def get_file_extension(self, filename: str) -> str:
         """Extract file extension from filename"""
@@ -81,7 +121,7 @@ class FileService:
     
     def is_supported_format(self, file_extension: str) -> bool:
         """Check if file format is supported"""
-        return file_extension.lower() in Config.SUPPORTED_FORMATS
+        return file_extension.lower() in self._SUPPORTED
     
     def cleanup_file(self, file_path: str) -> None:
         """Clean up a temporary file"""
@@ -99,13 +139,14 @@ class FileService:
             current_time = time.time()
             max_age_seconds = max_age_hours * 3600
             
-            for filename in os.listdir(self.temp_dir):
-                file_path = os.path.join(self.temp_dir, filename)
-                if os.path.isfile(file_path):
-                    file_age = current_time - os.path.getctime(file_path)
-                    if file_age > max_age_seconds:
-                        self.cleanup_file(file_path)
-                        logger.debug(f"Cleaned up old temp file: {filename}")
+            # scandir entries cache their type and stat, so each file costs a single stat
+            with os.scandir(self.temp_dir) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        file_age = current_time - entry.stat().st_ctime
+                        if file_age > max_age_seconds:
+                            self.cleanup_file(entry.path)
+                            logger.debug(f"Cleaned up old temp file: {entry.name}")
                         
         except Exception as e:
             logger.warning(f"Error during temp file cleanup: {e}")
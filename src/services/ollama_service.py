@@ -1,40 +1,41 @@
 """
 Ollama service for LLM integration
 """
+import asyncio
 import logging
+import time
 import ollama
-from typing import Optional, Dict, Any
-from src.config import Config
+import orjson
+from functools import lru_cache
+from typing import Optional, Dict, Any, Iterator, Tuple
+from src.config import config
+from src.processors.base_processor import Suggestion
 
 logger = logging.getLogger(__name__)
 
-class OllamaService:
-    def __init__(self):
-        self.client = ollama.Client(host=Config.OLLAMA_BASE_URL)
-        self.model = Config.OLLAMA_MODEL
-        
-    async def is_available(self) -> bool:
-        """Check if Ollama service is available"""
-        try:
-            models = self.client.list()
-            model_names = [model['name'] for model in models['models']]
-            return self.model in model_names
-        except Exception as e:
-            logger.error(f"Error checking Ollama availability: {e}")
-            return False
-    
-    async def analyze_text_for_pii(self, text: str) -> Dict[str, Any]:
-        """
-        Analyze text for personally identifiable information (PII)
-        
-        Args:
-            text: The text to analyze
-            
-        Returns:
-            Dictionary containing analysis results
-        """
-        try:
-            prompt = f"""
+# Seconds a successful availability check is trusted for
+_AVAILABILITY_TTL = 60.0
+
+# Bounds the number of in-flight generations sent to the Ollama server
+_CHAT_SEMAPHORE = asyncio.Semaphore(config.ollama_max_concurrency)
+
+# Replacement text for each PII type
+_PII_REPLACEMENTS = {
+    "name": "[NAME REDACTED]",
+    "email": "[EMAIL REDACTED]",
+    "phone": "[PHONE REDACTED]",
+    "address": "[ADDRESS REDACTED]",
+    "credit_card": "[CARD NUMBER REDACTED]",
+    "ssn": "[SSN REDACTED]",
+    "bank_account": "[ACCOUNT NUMBER REDACTED]",
+    "id_number": "[ID NUMBER REDACTED]",
+    "date_of_birth": "[DOB REDACTED]",
+    "medical": "[MEDICAL INFO REDACTED]"
+}
+
+# PII analysis prompt, the text to analyze goes between the prefix and suffix.
+# Plain concatenation keeps braces in the text from needing any escaping.
+_PROMPT_PREFIX = """
 Analyze the following text for personally identifiable information (PII) and sensitive data. 
 Identify and categorize any sensitive information found.
 
@@ -51,48 +52,152 @@ Categories to look for:
 - Medical information
 
 Text to analyze:
-{text}
+"""
+
+_PROMPT_SUFFIX = """
 
 Respond in JSON format with:
-{{
+{
     "found_pii": true/false,
     "categories": ["category1", "category2", ...],
     "details": [
-        {{
+        {
             "type": "category",
             "text": "actual sensitive text found",
             "confidence": 0.0-1.0,
             "start_pos": position_in_text,
             "end_pos": position_in_text
-        }}
+        }
     ],
     "recommendation": "brief recommendation"
-}}
+}
 
 Do NOT include additional explanation as the response will be put into json.loads to convert into a json readable format.
 """
 
-            response = self.client.chat(
-                model=self.model,
-                messages=[{
-                    'role': 'user',
-                    'content': prompt
-                }],
-                options={
-                    'temperature': 0.1,  # Low temperature for consistent results
-                    'top_p': 0.9
-                }
-            )
+# Long texts are analyzed in chunks of this many characters, overlapping
+# so that PII on a chunk boundary is still seen whole by one of them
+_CHUNK_SIZE = 3000
+_CHUNK_OVERLAP = 200
+
+def _chunks(text: str, size: int = _CHUNK_SIZE, overlap: int = _CHUNK_OVERLAP) -> Iterator[Tuple[int, str]]:
+    """Split text into overlapping (offset, chunk) pairs"""
+    if len(text) <= size:
+        yield 0, text
+        return
+    
+    step = size - overlap
+    for offset in range(0, len(text) - overlap, step):
+        yield offset, text[offset:offset + size]
+
+class OllamaService:
+    def __init__(self):
+        self.client = ollama.AsyncClient(host=config.ollama_base_url)
+        self.model = config.ollama_model
+        self._available_until = 0.0
+        
+    async def is_available(self) -> bool:
+        """Check if Ollama service is available, caching a positive result for a while"""
+        now = time.monotonic()
+        if now < self._available_until:
+            return True
+        
+        try:
+            models = await self.client.list()
+            available = any(model['name'] == self.model for model in models['models'])
+            if available:
+                self._available_until = now + _AVAILABILITY_TTL
+            return available
+        except Exception as e:
+            logger.error(f"Error checking Ollama availability: {e}")
+            return False
+    
+    async def analyze_text_for_pii(self, text: str) -> Dict[str, Any]:
+        """
+        Analyze text for personally identifiable information (PII)
+        
+        Long texts are split into overlapping chunks that are analyzed
+        concurrently and merged back into a single result.
+        
+        Args:
+            text: The text to analyze
+            
+        Returns:
+            Dictionary containing analysis results
+        """
+        results = await asyncio.gather(*[
+            self._analyze_chunk(offset, chunk) for offset, chunk in _chunks(text)
+        ])
+        
+        if len(results) == 1:
+            return results[0]
+        
+        # Merge chunk results, dropping matches seen twice in the overlaps
+        categories = []
+        details = []
+        seen = set()
+        for result in results:
+            for category in result.get('categories', []):
+                if category not in categories:
+                    categories.append(category)
+            for detail in result.get('details', []):
+                key = (detail.get('text'), detail.get('start_pos'))
+                if key not in seen:
+                    seen.add(key)
+                    details.append(detail)
+        
+        # A chunk that failed to analyze may hide PII, so the document as a
+        # whole is flagged and the failure's recommendation is reported
+        failed = [result for result in results if 'error' in result]
+        found = failed + [result for result in results if result.get('found_pii', False)]
+        merged = {
+            "found_pii": len(found) > 0,
+            "categories": categories,
+            "details": details,
+            "recommendation": (found or results)[0].get('recommendation', '')
+        }
+        
+        if failed:
+            merged['error'] = "; ".join(result['error'] for result in failed)
+        
+        return merged
+    
+    async def _analyze_chunk(self, offset: int, text: str) -> Dict[str, Any]:
+        """
+        Analyze one chunk of text for PII
+        
+        Args:
+            offset: Position of the chunk in the full text
+            text: The chunk to analyze
+            
+        Returns:
+            Dictionary containing analysis results, with positions relative
+            to the full text
+        """
+        try:
+            prompt = _PROMPT_PREFIX + text + _PROMPT_SUFFIX
+
+            async with _CHAT_SEMAPHORE:
+                response = await self.client.chat(
+                    model=self.model,
+                    messages=[{
+                        'role': 'user',
+                        'content': prompt
+                    }],
+                    format='json',  # Constrain the output to valid JSON
+                    options={
+                        'temperature': 0.1,  # Low temperature for consistent results
+                        'top_p': 0.9
+                    }
+                )
             
             result_text = response['message']['content']
             
-            # Try to parse as JSON, fallback to text analysis if needed
+            # format='json' can still yield broken JSON, e.g. when the output is
+            # truncated by the token limit, so flag the text for review instead
             try:
-                import json
-                result = json.loads(result_text)
-                return result
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return a basic structure
+                result = orjson.loads(result_text)
+            except orjson.JSONDecodeError:
                 logger.warning("Failed to parse LLM response as JSON")
                 return {
                     "found_pii": True,
@@ -101,6 +206,15 @@ Do NOT include additional explanation as the response will be put into json.load
                     "recommendation": "Manual review recommended",
                     "raw_response": result_text
                 }
+            
+            # Make positions relative to the full text
+            if offset:
+                for detail in result.get('details', []):
+                    for key in ('start_pos', 'end_pos'):
+                        if isinstance(detail.get(key), int):
+                            detail[key] += offset
+            
+            return result
                 
         except Exception as e:
             logger.error(f"Error analyzing text with Ollama: {e}")
@@ -120,7 +234,7 @@ Do NOT include additional explanation as the response will be put into json.load
             analysis_result: Result from analyze_text_for_pii
             
         Returns:
-            Dictionary with redaction suggestions
+            Dictionary with "needs_redaction" and a list of Suggestion under "suggestions"
         """
         if not analysis_result.get('found_pii', False):
             return {
@@ -128,37 +242,52 @@ Do NOT include additional explanation as the response will be put into json.load
                 "suggestions": []
             }
         
-        suggestions = []
+        # One suggestion per text, keeping the highest-confidence detection
+        # and every position the text was reported at
+        suggestions = {}
         for detail in analysis_result.get('details', []):
-            if detail.get('confidence', 0) >= Config.CONFIDENCE_THRESHOLD:
-                suggestions.append({
-                    "text": detail['text'],
-                    "replacement": self._generate_replacement(detail['type']),
-                    "type": detail['type'],
-                    "confidence": detail['confidence']
-                })
+            if detail.get('confidence', 0) >= config.confidence_threshold:
+                text = detail['text']
+                spans = suggestions[text].spans if text in suggestions else []
+                if text not in suggestions or detail['confidence'] > suggestions[text].confidence:
+                    suggestions[text] = Suggestion(
+                        text=text,
+                        replacement=self._generate_replacement(detail['type']),
+                        type=detail['type'],
+                        confidence=detail['confidence'],
+                        spans=spans
+                    )
+                
+                start, end = detail.get('start_pos'), detail.get('end_pos')
+                if isinstance(start, int) and isinstance(end, int) and (start, end) not in spans:
+                    spans.append((start, end))
         
         return {
             "needs_redaction": len(suggestions) > 0,
-            "suggestions": suggestions
+            "suggestions": list(suggestions.values())
         }
     
-    def _generate_replacement(self, pii_type: str) -> str:
-        """Generate appropriate replacement text for different PII types"""
-        replacements = {
-            "name": "[NAME REDACTED]",
-            "email": "[EMAIL REDACTED]",
-            "phone": "[PHONE REDACTED]",
-            "address": "[ADDRESS REDACTED]",
-            "credit_card": "[CARD NUMBER REDACTED]",
-            "ssn": "[SSN REDACTED]",
-            "bank_account": "[ACCOUNT NUMBER REDACTED]",
-            "id_number": "[ID NUMBER REDACTED]",
-            "date_of_birth": "[DOB REDACTED]",
-            "medical": "[MEDICAL INFO REDACTED]"
-        }
+    async def analyze_and_suggest(self, text: str) -> Dict[str, Any]:
+        """
+        Analyze text for PII and generate redaction suggestions in one call
+        
+        Args:
+            text: The text to analyze
+            
+        Returns:
+            Analysis result from analyze_text_for_pii extended with the
+            "needs_redaction" and "suggestions" keys
+        """
+        analysis_result = await self.analyze_text_for_pii(text)
+        redaction_suggestions = await self.generate_redaction_suggestions(analysis_result)
         
-        return replacements.get(pii_type.lower(), "[SENSITIVE INFO REDACTED]")
+        return {**analysis_result, **redaction_suggestions}
+    
+    @staticmethod
+    @lru_cache(maxsize=32)
+    def _generate_replacement(pii_type: str) -> str:
+        """Generate appropriate replacement text for different PII types"""
+        return _PII_REPLACEMENTS.get(pii_type.lower(), "[SENSITIVE INFO REDACTED]")
 
 # Global instance
 ollama_service = OllamaService()
@@ -0,0 +1,142 @@
+"""
+Tests for the text file processor
+"""
+import asyncio
+
+import pytest
+
+from src.processors import txt_processor
+from src.processors.base_processor import Suggestion
+from src.processors.txt_processor import TextProcessor
+
+@pytest.fixture(params=['whole', 'stream'])
+def processor(request, monkeypatch):
+    """A text processor, forced to stream in tiny chunks for the 'stream' variant"""
+    if request.param == 'stream':
+        monkeypatch.setattr(txt_processor, '_STREAM_MIN_SIZE', 0)
+        monkeypatch.setattr(txt_processor, '_STREAM_CHUNK_SIZE', 4)
+    return TextProcessor()
+
+@pytest.mark.parametrize('encoding', ['utf-8', 'latin-1', 'utf-16'])
+def test_redacts_text_as_extracted(processor, tmp_path, encoding):
+    source = tmp_path / 'input.txt'
+    source.write_bytes("José Müller lives here, José.".encode(encoding))
+    output = tmp_path / 'output.txt'
+    
+    async def run():
+        # Redact the name exactly as it was shown to the LLM
+        text = await processor.extract_text(str(source))
+        name = text.split()[0]
+        redactions = [Suggestion(text=name, replacement='[X]', type='name', confidence=1.0)]
+        success = await processor.apply_redactions(str(source), redactions, str(output))
+        return success, text.replace(name, '[X]')
+    
+    success, expected = asyncio.run(run())
+    
+    assert success
+    assert output.read_text(encoding='utf-8') == expected
+    assert 'Jos' not in expected
+
+class FakeOllamaService:
+    """Stands in for OllamaService, flagging every "Name" as PII"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    async def analyze_and_suggest(self, text):
+        self.calls += 1
+        # Finish out of order, later files first
+        await asyncio.sleep(0.01 / len(text))
+        if 'broken' in text:
+            raise RuntimeError("analysis failed")
+        return {
+            "found_pii": True,
+            "needs_redaction": True,
+            "suggestions": [Suggestion(text='Name', replacement='[X]', type='name', confidence=1.0)]
+        }
+
+def test_process_many_keeps_order_and_isolates_failures(tmp_path):
+    contents = {
+        'a.txt': "Name 1",
+        'empty.txt': "",
+        'b.txt': "Name 2 and a much longer line",
+        'clean.txt': "nothing to see here",
+        'broken.txt': "Name 3 broken",
+    }
+    paths = []
+    for name, content in contents.items():
+        path = tmp_path / name
+        path.write_text(content)
+        paths.append(str(path))
+    paths.insert(2, str(tmp_path / 'missing.txt'))
+    
+    service = FakeOllamaService()
+    processor = TextProcessor()
+    results = asyncio.run(processor.process_many(paths, service, concurrency=2))
+    
+    outputs = {}
+    for result in results:
+        if result.output_file:
+            with open(result.output_file) as file:
+                outputs[result.output_file] = file.read()
+            processor.cleanup_temp_file(result.output_file)
+    
+    assert len(results) == len(paths)
+    a, empty, missing, b, clean, broken = results
+    
+    assert a.success and outputs[a.output_file] == "[X] 1"
+    assert b.success and outputs[b.output_file] == "[X] 2 and a much longer line"
+    assert not empty.success and empty.message == "No text content found in file"
+    assert not missing.success and "Failed to extract text" in missing.message
+    assert clean.success and not clean.pii_found
+    assert not broken.success and "analysis failed" in broken.message
+    
+    # Files without text or PII indicators never reach the LLM
+    assert service.calls == 3
+
+class RecordingOllamaService:
+    """Stands in for OllamaService, recording the texts sent for analysis"""
+    
+    def __init__(self):
+        self.texts = []
+    
+    async def analyze_and_suggest(self, text):
+        self.texts.append(text)
+        return {"found_pii": False, "needs_redaction": False, "suggestions": []}
+
+@pytest.mark.parametrize('content, analyzed', [
+    ("José Müller lives here", True),
+    ("Contact Émile Zola", True),
+    ("JOHN SMITH has cancer", True),
+    ("the meeting moved to tuesday. Bring snacks.", False),
+])
+def test_prefilter_only_skips_text_without_pii_indicators(tmp_path, content, analyzed):
+    source = tmp_path / 'input.txt'
+    source.write_text(content, encoding='utf-8')
+    
+    service = RecordingOllamaService()
+    result = asyncio.run(TextProcessor().process_file(str(source), service))
+    
+    assert result.success and not result.pii_found
+    assert service.texts == ([content] if analyzed else [])
+
+class FailingClient:
+    """Stands in for ollama.AsyncClient with the server down"""
+    
+    async def chat(self, **kwargs):
+        raise ConnectionError("Ollama is not running")
+
+@pytest.mark.parametrize('length', [100, 5000])
+def test_failed_analysis_is_never_reported_clean(tmp_path, length):
+    # Imported here, the service module needs the bot's configuration
+    from src.services.ollama_service import OllamaService
+    
+    source = tmp_path / 'input.txt'
+    source.write_text(("Call Jane Doe. " * length)[:length], encoding='utf-8')
+    
+    service = OllamaService()
+    service.client = FailingClient()
+    result = asyncio.run(TextProcessor().process_file(str(source), service))
+    
+    assert not result.success
+    assert "manual review required" in result.message